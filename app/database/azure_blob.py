@@ -1,155 +1,369 @@
-from azure.storage.blob import BlobServiceClient, ContainerClient, ContentSettings
-from dotenv import load_dotenv
+from azure.core.exceptions import HttpResponseError, ResourceExistsError, ResourceNotFoundError
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.storage.blob import BlobSasPermissions, ContentSettings, generate_blob_sas
+from azure.storage.blob.aio import BlobServiceClient, ContainerClient, StorageStreamDownloader
+import aiohttp
+import asyncio
+import functools
+import logging
 import os
-from typing import Optional
-import io
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+from typing import Iterable, List, Optional, IO, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Max open connections to Azure, shared by all requests in this worker
+AZURE_POOL_SIZE = int(os.getenv("AZURE_POOL_SIZE", 64))
+
+# Largest file the API accepts. Uploads up to this size go out as a single Put Blob:
+# one round-trip instead of staged blocks plus a commit, at the cost of the SDK
+# reading the whole file (up to 10 MB) into memory per concurrent upload
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+TRANSFER_BLOCK_SIZE = 4 * 1024 * 1024
+TRANSFER_MAX_CONCURRENCY = 4
+
+# Max sub-requests Azure accepts in one blob batch call
+DELETE_BATCH_SIZE = 256
+
+
+def _stream_positions(args, kwargs) -> Optional[list]:
+    """Current offsets of the file-like arguments, or None if any of them cannot be rewound"""
+    positions = []
+    for arg in (*args, *kwargs.values()):
+        if hasattr(arg, "read"):
+            try:
+                positions.append((arg, arg.tell()))
+            except (AttributeError, OSError):
+                return None
+    return positions
+
+
+def with_container_retry(func):
+    """Create the container on a ContainerNotFound error and retry the operation once
+
+    File-like arguments are rewound before the retry, since the first attempt may
+    already have consumed them; operations on non-seekable streams are not retried.
+    """
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        positions = _stream_positions(args, kwargs)
+        try:
+            return await func(self, *args, **kwargs)
+        except ResourceNotFoundError as e:
+            if e.error_code != "ContainerNotFound" or positions is None:
+                raise
+            await self._create_container()
+            for stream, offset in positions:
+                stream.seek(offset)
+            return await func(self, *args, **kwargs)
+    return wrapper
 
-load_dotenv()
 
 class AzureBlobStorage:
     def __init__(self):
         self.connection_string = os.getenv('AZURE_STORAGE_CONNECTION_STRING')
         self.container_name = os.getenv('AZURE_CONTAINER_NAME')
-        
+
         if not self.connection_string:
             raise ValueError("Azure Storage connection string not found in environment variables")
-        
-        self.blob_service_client = BlobServiceClient.from_connection_string(self.connection_string)
-        self.container_client = self._get_or_create_container()
-    
-    def _get_or_create_container(self) -> ContainerClient:
-        """Get container or create if it doesn't exist"""
-        try:
-            container_client = self.blob_service_client.get_container_client(self.container_name)
-            # Check if container exists
-            container_client.get_container_properties()
-            print(f"✅ Container '{self.container_name}' already exists")
-        except Exception:
-            # Create container if it doesn't exist
-            container_client = self.blob_service_client.create_container(self.container_name)
-            print(f"✅ Container '{self.container_name}' created successfully")
-        
-        return container_client
-    
-    def upload_file(self, file_data: bytes, blob_name: str, content_type: str = "application/octet-stream") -> str:
+
+        # Clients are created by open() once the event loop is running
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.blob_service_client: Optional[BlobServiceClient] = None
+        self.container_client: Optional[ContainerClient] = None
+
+        # Container existence is not checked up front; it is created lazily
+        # the first time an operation fails with ContainerNotFound
+        self._container_verified = False
+        self._container_lock = asyncio.Lock()
+
+    async def _create_container(self):
+        """Create the container, at most once per process"""
+        async with self._container_lock:
+            if self._container_verified:
+                return
+            try:
+                await self.blob_service_client.create_container(self.container_name)
+                logger.info("Container %s created", self.container_name)
+            except ResourceExistsError:
+                pass
+            self._container_verified = True
+
+    async def open(self):
+        """Create the shared connection pool and clients (called once at startup)"""
+        if self.blob_service_client is not None:
+            return
+
+        connector = aiohttp.TCPConnector(limit=AZURE_POOL_SIZE, limit_per_host=AZURE_POOL_SIZE)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            auto_decompress=False,
+            # Honour HTTPS_PROXY/NO_PROXY like azure-core's own transport does
+            trust_env=True
+        )
+        transport = AioHttpTransport(session=self._session, session_owner=False)
+
+        # Every container/blob client derived from this one reuses the same pool
+        self.blob_service_client = BlobServiceClient.from_connection_string(
+            self.connection_string,
+            transport=transport,
+            max_single_put_size=MAX_UPLOAD_BYTES,
+            max_block_size=TRANSFER_BLOCK_SIZE,
+            # Keep the initial GET to one block so downloads start streaming quickly
+            max_single_get_size=TRANSFER_BLOCK_SIZE,
+            max_chunk_get_size=TRANSFER_BLOCK_SIZE
+        )
+        self.container_client = self.blob_service_client.get_container_client(self.container_name)
+
+    async def close(self):
+        """Close the clients and the underlying HTTP session"""
+        if self.blob_service_client is not None:
+            await self.blob_service_client.close()
+        if self._session is not None:
+            await self._session.close()
+
+    @with_container_retry
+    async def upload_file(
+        self,
+        file_data: Union[bytes, IO[bytes]],
+        blob_name: str,
+        length: Optional[int] = None,
+        content_type: str = "application/octet-stream"
+    ) -> Tuple[str, str]:
         """
         Upload file to Azure Blob Storage
-        
+
         Args:
-            file_data: File content as bytes
+            file_data: File content as bytes or a readable file-like object.
+                Streams up to MAX_UPLOAD_BYTES are read into memory and sent as
+                a single Put Blob; larger or unsized ones go up in blocks
             blob_name: Name for the blob (file name in storage)
+            length: Size of the data in bytes, if known
             content_type: MIME type of the file
-            
+
         Returns:
-            URL of the uploaded blob
+            URL and ETag of the uploaded blob
         """
         try:
             blob_client = self.container_client.get_blob_client(blob_name)
-            
+
             # Convert the string/dict into a ContentSettings object
             settings = ContentSettings(content_type=content_type)
-            
-            blob_client.upload_blob(
-                file_data, 
+
+            result = await blob_client.upload_blob(
+                file_data,
+                length=length,
                 overwrite=True,
-                content_settings=settings # Pass the object, not a dict
+                content_settings=settings, # Pass the object, not a dict
+                max_concurrency=TRANSFER_MAX_CONCURRENCY
             )
-            
-            # Return the blob URL
+
+            # Return the blob URL and ETag
             blob_url = blob_client.url
-            print(f"✅ File uploaded successfully: {blob_name}")
-            return blob_url
-        except Exception as e:
-            print(f"❌ Error uploading file: {e}")
+            logger.debug("Uploaded %s", blob_name)
+            return blob_url, result["etag"]
+        except ResourceNotFoundError:
             raise
-    
-    def download_file(self, blob_name: str) -> bytes:
+        except Exception:
+            logger.exception("Upload failed for %s", blob_name)
+            raise
+
+    @with_container_retry
+    async def download_file(self, blob_name: str) -> StorageStreamDownloader:
         """
         Download file from Azure Blob Storage
-        
+
         Args:
             blob_name: Name of the blob to download
-            
+
         Returns:
-            File content as bytes
+            Stream downloader; iterate ``chunks()`` to read the content
+
+        Raises:
+            ResourceNotFoundError: If the blob does not exist
         """
         try:
             blob_client = self.container_client.get_blob_client(blob_name)
-            blob_data = blob_client.download_blob()
-            return blob_data.readall()
-        except Exception as e:
-            print(f"❌ Error downloading file: {e}")
+            return await blob_client.download_blob()
+        except ResourceNotFoundError:
             raise
-    
-    def delete_file(self, blob_name: str) -> bool:
+        except Exception:
+            logger.exception("Download failed for %s", blob_name)
+            raise
+
+    @with_container_retry
+    async def delete_file(self, blob_name: str) -> bool:
         """
         Delete file from Azure Blob Storage
-        
+
         Args:
             blob_name: Name of the blob to delete
-            
+
         Returns:
             True if successful, False otherwise
+
+        Raises:
+            ResourceNotFoundError: If the blob does not exist
         """
         try:
             blob_client = self.container_client.get_blob_client(blob_name)
-            blob_client.delete_blob()
-            print(f"✅ File deleted successfully: {blob_name}")
+            await blob_client.delete_blob()
+            logger.debug("Deleted %s", blob_name)
             return True
-        except Exception as e:
-            print(f"❌ Error deleting file: {e}")
+        except ResourceNotFoundError:
+            raise
+        except Exception:
+            logger.exception("Delete failed for %s", blob_name)
             return False
-    
-    def list_files(self, prefix: Optional[str] = None) -> list:
+
+    async def _delete_batch(self, blob_names: List[str], raise_on_failure: bool = False) -> int:
+        """Delete up to DELETE_BATCH_SIZE blobs in one batch request
+
+        Blobs that are already gone are not counted. With raise_on_failure, any other
+        failed sub-request (throttling, lease, ...) raises HttpResponseError.
+        """
+        responses = await self.container_client.delete_blobs(*blob_names, raise_on_any_failure=False)
+        statuses = [response.status_code async for response in responses]
+        if raise_on_failure:
+            failed = [
+                name for name, code in zip(blob_names, statuses) if code not in (202, 404)
+            ]
+            if failed:
+                raise HttpResponseError(
+                    message=f"Failed to delete {len(failed)} of {len(blob_names)} blobs, e.g. {failed[0]}"
+                )
+        return statuses.count(202)
+
+    @with_container_retry
+    async def delete_files(self, blob_names: Iterable[str]) -> int:
+        """
+        Delete many files using the blob batch API
+
+        Args:
+            blob_names: Names of the blobs to delete
+
+        Returns:
+            Number of blobs deleted
+        """
+        names = list(blob_names)
+        deleted = 0
+        try:
+            for start in range(0, len(names), DELETE_BATCH_SIZE):
+                deleted += await self._delete_batch(names[start:start + DELETE_BATCH_SIZE])
+            logger.debug("Deleted %d of %d files", deleted, len(names))
+            return deleted
+        except ResourceNotFoundError:
+            raise
+        except Exception:
+            logger.exception("Batch delete failed")
+            raise
+
+    @with_container_retry
+    async def delete_prefix(self, prefix: str) -> int:
+        """
+        Delete every file under a prefix, streaming the listing into batch deletes
+
+        Args:
+            prefix: Blob name prefix, e.g. "<user_id>/"
+
+        Returns:
+            Number of blobs deleted
+
+        Raises:
+            HttpResponseError: If any blob could not be deleted; blobs already
+                deleted stay deleted, so the call can simply be repeated
+        """
+        batch = []
+        deleted = 0
+        try:
+            async for blob in self.container_client.list_blobs(name_starts_with=prefix):
+                batch.append(blob.name)
+                if len(batch) == DELETE_BATCH_SIZE:
+                    deleted += await self._delete_batch(batch, raise_on_failure=True)
+                    batch = []
+            if batch:
+                deleted += await self._delete_batch(batch, raise_on_failure=True)
+            logger.debug("Deleted %d files under %s", deleted, prefix)
+            return deleted
+        except ResourceNotFoundError:
+            raise
+        except Exception:
+            logger.exception("Batch delete failed for prefix %s", prefix)
+            raise
+
+    @with_container_retry
+    async def list_files(self, prefix: Optional[str] = None) -> list:
         """
         List all files in the container
-        
+
         Args:
             prefix: Optional prefix to filter blobs
-            
+
         Returns:
             List of blob names
         """
         try:
             blobs = self.container_client.list_blobs(name_starts_with=prefix)
-            return [blob.name for blob in blobs]
-        except Exception as e:
-            print(f"❌ Error listing files: {e}")
+            return [blob.name async for blob in blobs]
+        except ResourceNotFoundError:
             raise
-    
+        except Exception:
+            logger.exception("Listing failed for prefix %s", prefix)
+            raise
+
     def get_file_url(self, blob_name: str) -> str:
         """
         Get the URL of a blob
-        
+
         Args:
             blob_name: Name of the blob
-            
+
         Returns:
             URL of the blob
         """
-        blob_client = self.container_client.get_blob_client(blob_name)
-        return blob_client.url
-    
-    def file_exists(self, blob_name: str) -> bool:
+        # Built from the container URL; no need to construct a blob client
+        return f"{self.container_client.url}/{quote(blob_name, safe='~/')}"
+
+    def generate_download_sas(
+        self,
+        blob_name: str,
+        filename: Optional[str] = None,
+        content_type: Optional[str] = None,
+        expiry_minutes: int = 5
+    ) -> str:
         """
-        Check if a file exists in the container
-        
+        Generate a short-lived read-only SAS token for a blob
+
         Args:
-            blob_name: Name of the blob to check
-            
+            blob_name: Name of the blob
+            filename: Download filename sent back in Content-Disposition
+            content_type: MIME type sent back in Content-Type
+            expiry_minutes: Minutes until the token expires
+
         Returns:
-            True if exists, False otherwise
+            SAS token query string (without the leading '?')
         """
-        try:
-            blob_client = self.container_client.get_blob_client(blob_name)
-            blob_client.get_blob_properties()
-            return True
-        except Exception:
-            return False
+        content_disposition = None
+        if filename:
+            safe_name = filename.replace('"', '')
+            content_disposition = f'attachment; filename="{safe_name}"'
+
+        return generate_blob_sas(
+            account_name=self.blob_service_client.account_name,
+            container_name=self.container_name,
+            blob_name=blob_name,
+            account_key=self.blob_service_client.credential.account_key,
+            permission=BlobSasPermissions(read=True),
+            expiry=datetime.now(timezone.utc) + timedelta(minutes=expiry_minutes),
+            content_disposition=content_disposition,
+            content_type=content_type
+        )
 
 # Create a singleton instance
 azure_storage = AzureBlobStorage()
 
 def get_azure_storage() -> AzureBlobStorage:
     """Dependency to get Azure Storage instance"""
-    return azure_storage
\ No newline at end of file
+    return azure_storage
@@ -1,16 +1,17 @@
 from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
 import os
+import logging
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 # Database URL
 DATABASE_URL = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 
 # Create engine
-engine = create_engine(DATABASE_URL, echo=True)
+# SQL echo writes every statement to stdout; opt in with DB_ECHO=1
+engine = create_engine(DATABASE_URL, echo=os.getenv("DB_ECHO") == "1")
 
 # Create session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -30,8 +31,8 @@ def test_connection():
     try:
         with engine.connect() as connection:
             result = connection.execute(text("SELECT 1"))
-            print("✅ Database connection successful!")
+            logger.debug("Database connection successful")
             return True
     except Exception as e:
-        print(f"❌ Database connection failed: {e}")
+        logger.warning("Database connection failed: %s", e)
         return False
\ No newline at end of file
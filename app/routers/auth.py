@@ -1,5 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Header
 from typing import Optional
+from sqlalchemy import select, update, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app.database.connection import get_db
 from app.models.model import User
@@ -16,25 +18,51 @@ from datetime import timedelta
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
+def _raise_otp_error(db: Session, email: str, no_otp_detail: str, check_verified: bool = False):
+    """Work out why an OTP-guarded UPDATE matched no row and raise the matching error"""
+    user = db.execute(
+        select(User.is_verified, User.otp_code, User.otp_expiry).where(User.email == email)
+    ).one_or_none()
+    
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    if check_verified and user.is_verified:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User already verified"
+        )
+    
+    if not user.otp_code or not user.otp_expiry:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=no_otp_detail
+        )
+    
+    if not is_otp_valid(user.otp_expiry):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="OTP has expired. Please request a new one."
+        )
+    
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid OTP"
+    )
+
+
 @router.post("/signup", status_code=status.HTTP_201_CREATED)
-async def signup(
+def signup(
     request: SignupRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     email_service: EmailService = Depends(get_email_service)
 ):
     """Register a new user and send OTP for verification"""
     
-    # Check if user already exists
-    existing_user = db.query(User).filter(
-        (User.email == request.email) | (User.username == request.username)
-    ).first()
-    
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email or username already registered"
-        )
-    
     # Generate OTP
     otp = generate_otp()
     otp_expiry = get_otp_expiry()
@@ -51,12 +79,19 @@ async def signup(
         is_verified=False
     )
     
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    # Unique constraints on email/username reject duplicates atomically
+    try:
+        db.add(new_user)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email or username already registered"
+        )
     
-    # Send OTP email
-    await email_service.send_otp_email(request.email, otp, request.full_name)
+    # Send OTP email after the response is returned
+    background_tasks.add_task(email_service.send_otp_email, request.email, otp, request.full_name)
     
     return {
         "message": "User registered successfully. Please check your email for OTP verification.",
@@ -65,55 +100,35 @@ async def signup(
 
 
 @router.post("/verify-otp")
-async def verify_otp(
+def verify_otp(
     request: VerifyOTPRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     email_service: EmailService = Depends(get_email_service)
 ):
     """Verify OTP and activate user account"""
     
-    user = db.query(User).filter(User.email == request.email).first()
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    if user.is_verified:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User already verified"
-        )
-    
-    # Check OTP validity
-    if not user.otp_code or not user.otp_expiry:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No OTP found for this user"
-        )
-    
-    if not is_otp_valid(user.otp_expiry):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="OTP has expired. Please request a new one."
+    # Check the OTP and activate the user in a single atomic UPDATE
+    user = db.execute(
+        update(User)
+        .where(
+            User.email == request.email,
+            User.is_verified.is_(False),
+            User.otp_code == request.otp,
+            User.otp_expiry > func.now()
         )
+        .values(is_verified=True, is_active=True, otp_code=None, otp_expiry=None)
+        .returning(User.id, User.username, User.email, User.full_name)
+    ).one_or_none()
     
-    if user.otp_code != request.otp:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid OTP"
-        )
+    if not user:
+        db.rollback()
+        _raise_otp_error(db, request.email, "No OTP found for this user", check_verified=True)
     
-    # Activate user
-    user.is_verified = True
-    user.is_active = True
-    user.otp_code = None
-    user.otp_expiry = None
     db.commit()
     
-    # Send welcome email
-    await email_service.send_welcome_email(user.email, user.full_name)
+    # Send welcome email after the response is returned
+    background_tasks.add_task(email_service.send_welcome_email, user.email, user.full_name)
     
     return {
         "message": "Account verified successfully! Welcome email sent.",
@@ -130,7 +145,11 @@ async def verify_otp(
 def login(request: LoginRequest, db: Session = Depends(get_db)):
     """Login user and return JWT token"""
     
-    user = db.query(User).filter(User.email == request.email).first()
+    # Only load the columns needed to authenticate (uses the unique ix_users_email index)
+    user = db.execute(
+        select(User.id, User.hashed_password, User.is_verified, User.is_active)
+        .where(User.email == request.email)
+    ).one_or_none()
     
     if not user:
         raise HTTPException(
@@ -166,31 +185,36 @@ def login(request: LoginRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/forget-password")
-async def forget_password(
+def forget_password(
     request: ForgetPasswordRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     email_service: EmailService = Depends(get_email_service)
 ):
     """Send OTP for password reset"""
     
-    user = db.query(User).filter(User.email == request.email).first()
+    # Generate OTP
+    otp = generate_otp()
+    otp_expiry = get_otp_expiry()
+    
+    user = db.execute(
+        update(User)
+        .where(User.email == request.email)
+        .values(otp_code=otp, otp_expiry=otp_expiry)
+        .returning(User.full_name)
+    ).one_or_none()
     
     if not user:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No account found with this email"
         )
     
-    # Generate OTP
-    otp = generate_otp()
-    otp_expiry = get_otp_expiry()
-    
-    user.otp_code = otp
-    user.otp_expiry = otp_expiry
     db.commit()
     
-    # Send OTP email
-    await email_service.send_otp_email(request.email, otp, user.full_name)
+    # Send OTP email after the response is returned
+    background_tasks.add_task(email_service.send_otp_email, request.email, otp, user.full_name)
     
     return {
         "message": "OTP sent to your email for password reset",
@@ -202,68 +226,64 @@ async def forget_password(
 def reset_password(request: ResetPasswordRequest, db: Session = Depends(get_db)):
     """Reset password using OTP"""
     
-    user = db.query(User).filter(User.email == request.email).first()
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    # Check OTP validity
-    if not user.otp_code or not user.otp_expiry:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No OTP found. Please request password reset first."
+    # Consume the OTP atomically first so bad requests never pay for a bcrypt hash
+    user = db.execute(
+        update(User)
+        .where(
+            User.email == request.email,
+            User.otp_code == request.otp,
+            User.otp_expiry > func.now()
         )
+        .values(otp_code=None, otp_expiry=None)
+        .returning(User.id)
+    ).one_or_none()
     
-    if not is_otp_valid(user.otp_expiry):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="OTP has expired. Please request a new one."
-        )
-    
-    if user.otp_code != request.otp:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid OTP"
-        )
-    
-    # Update password
-    user.hashed_password = hash_password(request.new_password)
-    user.otp_code = None
-    user.otp_expiry = None
+    if not user:
+        db.rollback()
+        _raise_otp_error(db, request.email, "No OTP found. Please request password reset first.")
+    
+    # Same transaction: the OTP is only cleared if the new password is stored too
+    db.execute(
+        update(User)
+        .where(User.id == user.id)
+        .values(hashed_password=hash_password(request.new_password))
+    )
     db.commit()
     
     return {"message": "Password reset successfully. You can now login with your new password."}
 
 
 @router.post("/resend-otp")
-async def resend_otp(
+def resend_otp(
     request: ForgetPasswordRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     email_service: EmailService = Depends(get_email_service)
 ):
     """Resend OTP for verification or password reset"""
     
-    user = db.query(User).filter(User.email == request.email).first()
+    # Generate new OTP
+    otp = generate_otp()
+    otp_expiry = get_otp_expiry()
+    
+    user = db.execute(
+        update(User)
+        .where(User.email == request.email)
+        .values(otp_code=otp, otp_expiry=otp_expiry)
+        .returning(User.full_name)
+    ).one_or_none()
     
     if not user:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    # Generate new OTP
-    otp = generate_otp()
-    otp_expiry = get_otp_expiry()
-    
-    user.otp_code = otp
-    user.otp_expiry = otp_expiry
     db.commit()
     
-    # Send OTP email
-    await email_service.send_otp_email(request.email, otp, user.full_name)
+    # Send OTP email after the response is returned
+    background_tasks.add_task(email_service.send_otp_email, request.email, otp, user.full_name)
     
     return {
         "message": "New OTP sent to your email",
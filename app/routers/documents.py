@@ -1,90 +1,134 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
-from typing import List
-from app.models.model import User, Document
+from azure.core.exceptions import ResourceNotFoundError
+from typing import List, Optional
+from app.models.model import Document
 from app.schemas.schema import DocumentResponse
 from app.database.connection import get_db
-from app.database.azure_blob import get_azure_storage, AzureBlobStorage
-from app.utils.dependencies import get_current_user
+from app.database.azure_blob import get_azure_storage, AzureBlobStorage, MAX_UPLOAD_BYTES
+from app.utils.dependencies import get_current_user_id
+import os
 import uuid
 
 
 router = APIRouter(prefix="/documents", tags=["Documents"])
 
+# Allowed MIME types for uploads, with the leading bytes their content must start with
+CONTENT_SIGNATURES = {
+    "image/jpeg": (b"\xff\xd8\xff",),
+    "image/png": (b"\x89PNG\r\n\x1a\n",),
+    "image/gif": (b"GIF87a", b"GIF89a"),
+    "application/pdf": (b"%PDF-",),
+    "application/msword": (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",),
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": (b"PK\x03\x04",)
+}
+ALLOWED_CONTENT_TYPES = frozenset(CONTENT_SIGNATURES)
+
+# Only this much of the upload is read to sniff its type
+SNIFF_BYTES = 512
+
+# Room for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def _add_and_refresh(db: Session, document: Document):
+    """Insert a row, commit and reload it (blocking; run in the threadpool from async routes)"""
+    db.add(document)
+    db.commit()
+    db.refresh(document)
+
+
+def _delete_and_commit(db: Session, document: Document):
+    """Delete a row and commit (blocking; run in the threadpool from async routes)"""
+    db.delete(document)
+    db.commit()
+
 
 @router.post("/upload", response_model=DocumentResponse)
 async def upload_document(
+    request: Request,
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
+    current_user_id: int = Depends(get_current_user_id),
     db: Session = Depends(get_db),
     azure_storage: AzureBlobStorage = Depends(get_azure_storage)
 ):
     """Upload a document to Azure Blob Storage (Protected route)"""
     
-    # Define allowed MIME types
-    ALLOWED_TYPES = [
-        "image/jpeg", 
-        "image/png", 
-        "image/gif", 
-        "application/pdf",
-        "application/msword", 
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-    ]
-
-    if file.content_type not in ALLOWED_TYPES:
+    if file.content_type not in ALLOWED_CONTENT_TYPES:
         raise HTTPException(
             status_code=400, 
             detail=f"File type {file.content_type} is not supported."
         )
     
-    try:
-        file_content = await file.read()
-        file_size = len(file_content)
-        
-        if file_size > 10 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="File is too large (Max 10MB)")
+    # Reject oversized bodies from the header before touching the stream
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+        raise HTTPException(status_code=400, detail="File is too large (Max 10MB)")
+
+    file_size = file.size
+    if file_size is not None and file_size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=400, detail="File is too large (Max 10MB)")
+
+    # Check the declared type against the file header without reading the whole file
+    head = await file.read(SNIFF_BYTES)
+    await file.seek(0)
+    if not head.startswith(CONTENT_SIGNATURES[file.content_type]):
+        raise HTTPException(
+            status_code=400,
+            detail=f"File content does not match type {file.content_type}."
+        )
 
-        file_extension = file.filename.split('.')[-1] if '.' in file.filename else ''
-        blob_name = f"{current_user.id}/{uuid.uuid4()}.{file_extension}"
+    try:
+        file_extension = os.path.splitext(file.filename)[1].lstrip('.')
+        blob_name = f"{current_user_id}/{uuid.uuid4()}.{file_extension}"
         
-        # Upload to Azure
-        blob_url = azure_storage.upload_file(
-            file_data=file_content,
+        # Stream the spooled upload straight to Azure
+        blob_url, etag = await azure_storage.upload_file(
+            file_data=file.file,
             blob_name=blob_name,
+            length=file_size,
             content_type=file.content_type or "application/octet-stream"
         )
         
         # Save to database
         new_document = Document(
-            user_id=current_user.id,
+            user_id=current_user_id,
             original_filename=file.filename,
             blob_name=blob_name,
             blob_url=blob_url,
             file_size=file_size,
-            content_type=file.content_type
+            content_type=file.content_type,
+            etag=etag
         )
         
-        db.add(new_document)
-        db.commit()
-        db.refresh(new_document)
+        await run_in_threadpool(_add_and_refresh, db, new_document)
         return new_document
     
     except Exception as e:
-        db.rollback()
+        await run_in_threadpool(db.rollback)
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
 @router.get("", response_model=List[DocumentResponse])
 def get_my_documents(
-    skip: int = 0,
+    response: Response,
+    cursor: Optional[int] = None,
     limit: int = 10,
-    current_user: User = Depends(get_current_user),
+    current_user_id: int = Depends(get_current_user_id),
     db: Session = Depends(get_db)
 ):
-    """Get all documents for the current user"""
-    documents = db.query(Document).filter(
-        Document.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
+    """Get documents for the current user, newest first (keyset pagination)"""
+    query = db.query(Document).filter(Document.user_id == current_user_id)
+    if cursor is not None:
+        query = query.filter(Document.id < cursor)
+
+    documents = query.order_by(Document.id.desc()).limit(limit).all()
+
+    # Client passes this back as ?cursor= to fetch the next page
+    if documents:
+        response.headers["X-Next-Cursor"] = str(documents[-1].id)
     
     return documents
 
@@ -92,13 +136,13 @@ def get_my_documents(
 @router.get("/{document_id}", response_model=DocumentResponse)
 def get_document(
     document_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user_id: int = Depends(get_current_user_id),
     db: Session = Depends(get_db)
 ):
     """Get a specific document"""
     document = db.query(Document).filter(
         Document.id == document_id,
-        Document.user_id == current_user.id
+        Document.user_id == current_user_id
     ).first()
     
     if not document:
@@ -108,58 +152,76 @@ def get_document(
 
 
 @router.get("/{document_id}/download")
-async def download_document(
+def download_document(
     document_id: int,
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    current_user_id: int = Depends(get_current_user_id),
     db: Session = Depends(get_db),
     azure_storage: AzureBlobStorage = Depends(get_azure_storage)
 ):
-    """Download a document"""
+    """Download a document (redirects to a short-lived Azure SAS URL)"""
     document = db.query(Document).filter(
         Document.id == document_id,
-        Document.user_id == current_user.id
+        Document.user_id == current_user_id
     ).first()
     
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    try:
-        file_content = azure_storage.download_file(document.blob_name)
+    headers = {}
+    if document.etag:
+        headers["ETag"] = document.etag
         
-        from fastapi.responses import Response
-        return Response(
-            content=file_content,
-            media_type=document.content_type or "application/octet-stream",
-            headers={
-                "Content-Disposition": f"attachment; filename={document.original_filename}"
-            }
+        # Client already has this version; answer without touching Azure.
+        # If-None-Match uses weak comparison, so W/ prefixes are ignored
+        client_etags = [
+            tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")
+        ]
+        if "*" in client_etags or document.etag.removeprefix("W/") in client_etags:
+            return Response(status_code=304, headers=headers)
+    
+    try:
+        sas_token = azure_storage.generate_download_sas(
+            document.blob_name,
+            filename=document.original_filename,
+            content_type=document.content_type
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    
+    # The client fetches the bytes straight from Azure
+    return RedirectResponse(url=f"{document.blob_url}?{sas_token}", status_code=307, headers=headers)
 
 
 @router.delete("/{document_id}")
-def delete_document(
+async def delete_document(
     document_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user_id: int = Depends(get_current_user_id),
     db: Session = Depends(get_db),
     azure_storage: AzureBlobStorage = Depends(get_azure_storage)
 ):
     """Delete a document"""
-    document = db.query(Document).filter(
-        Document.id == document_id,
-        Document.user_id == current_user.id
-    ).first()
+    # Async route for the Azure call; blocking DB work goes to the threadpool
+    document = await run_in_threadpool(
+        lambda: db.query(Document).filter(
+            Document.id == document_id,
+            Document.user_id == current_user_id
+        ).first()
+    )
     
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
     try:
-        azure_storage.delete_file(document.blob_name)
-        db.delete(document)
-        db.commit()
+        try:
+            await azure_storage.delete_file(document.blob_name)
+        except ResourceNotFoundError:
+            # Blob is already gone, only the metadata row is left to remove
+            pass
+
+        await run_in_threadpool(_delete_and_commit, db, document)
         
         return {"message": "Document deleted successfully"}
     except Exception as e:
-        db.rollback()
+        await run_in_threadpool(db.rollback)
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
 from .. import models, schemas
 from app.database.connection import get_db
+from app.database.azure_blob import get_azure_storage, AzureBlobStorage
 
 router = APIRouter( prefix="/users", tags=["users"])
 
@@ -32,12 +34,38 @@ def get_user(user_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
+def _delete_user_rows(db: Session, user: models.User):
+    """Delete a user and all their document rows in one transaction (blocking)"""
+    db.query(models.Document).filter(
+        models.Document.user_id == user.id
+    ).delete(synchronize_session=False)
+    
+    db.delete(user)
+    db.commit()
+
 @router.delete("/{user_id}")
-def delete_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+async def delete_user(
+    user_id: int,
+    db: Session = Depends(get_db),
+    azure_storage: AzureBlobStorage = Depends(get_azure_storage)
+):
+    # Async route for the Azure calls; blocking DB work goes to the threadpool
+    user = await run_in_threadpool(
+        lambda: db.query(models.User).filter(models.User.id == user_id).first()
+    )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    db.delete(user)
-    db.commit()
+    # Remove the user's blobs with batch deletes, then their rows in one statement.
+    # Rows are only deleted once every blob is gone, so a failed call can be retried
+    try:
+        await azure_storage.delete_prefix(f"{user_id}/")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    
+    try:
+        await run_in_threadpool(_delete_user_rows, db, user)
+    except Exception as e:
+        await run_in_threadpool(db.rollback)
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
     return {"message": "User deleted successfully"}
\ No newline at end of file
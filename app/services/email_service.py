@@ -1,11 +1,47 @@
 import aiosmtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from jinja2 import Template
+import asyncio
+import socket
+import ssl
+import time
+from typing import List, Optional, Tuple
+from email.message import EmailMessage
+from pathlib import Path
+import html
 import os
-from dotenv import load_dotenv
+import logging
 
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Templates are read once at import and filled in with str.format;
+# literal braces in the HTML/CSS are doubled
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates"
+OTP_TEMPLATE = (TEMPLATES_DIR / "otp_template.html").read_text(encoding="utf-8")
+WELCOME_TEMPLATE = (TEMPLATES_DIR / "welcome_template.html").read_text(encoding="utf-8")
+
+# Number of SMTP sessions kept open for concurrent sends
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 5))
+# Reconnect a session after it has sent this many messages
+SMTP_POOL_MAX_MESSAGES = int(os.getenv("SMTP_POOL_MAX_MESSAGES", 100))
+# Close a session after this long without sending
+SMTP_IDLE_TIMEOUT_SECONDS = int(os.getenv("SMTP_IDLE_TIMEOUT_SECONDS", 60))
+# Re-resolve the SMTP host's IPv4 address after this long
+SMTP_DNS_TTL_SECONDS = 300
+
+
+class _PooledSMTP:
+    """One pooled SMTP session and its usage counters"""
+    def __init__(self):
+        self.smtp: Optional[aiosmtplib.SMTP] = None
+        self.messages_sent = 0
+        self.last_used = 0.0
+        self.in_use = False
+    
+    def close(self):
+        """Close the session; it reconnects on next use"""
+        if self.smtp is not None:
+            self.smtp.close()
+            self.smtp = None
+        self.messages_sent = 0
 
 
 class EmailService:
@@ -16,50 +52,142 @@ class EmailService:
         self.smtp_password = os.getenv("SMTP_PASSWORD")
         self.from_email = os.getenv("SMTP_FROM_EMAIL")
         self.from_name = os.getenv("SMTP_FROM_NAME")
+        self._from_header = f"{self.from_name} <{self.from_email}>"
+        
+        # One TLS context (CA bundle loaded once) shared by every session;
+        # certificates are still checked against SMTP_HOST via SNI
+        self._tls_context = ssl.create_default_context()
+        self._smtp_ip: Optional[str] = None
+        self._smtp_ip_resolved_at = 0.0
+        
+        # Pool of SMTP sessions; each connects lazily on first use
+        self._connections = [_PooledSMTP() for _ in range(SMTP_POOL_SIZE)]
+        self._pool: asyncio.Queue = asyncio.Queue()
+        for conn in self._connections:
+            self._pool.put_nowait(conn)
+        self._reaper: Optional[asyncio.Task] = None
+    
+    async def _resolve_host(self) -> str:
+        """IPv4 address of the SMTP host, resolved off the event loop and cached"""
+        now = time.monotonic()
+        if self._smtp_ip is None or now - self._smtp_ip_resolved_at > SMTP_DNS_TTL_SECONDS:
+            try:
+                infos = await asyncio.get_running_loop().getaddrinfo(
+                    self.smtp_host, self.smtp_port, family=socket.AF_INET, type=socket.SOCK_STREAM
+                )
+                self._smtp_ip = infos[0][4][0]
+                self._smtp_ip_resolved_at = now
+            except OSError:
+                logger.warning("Could not resolve SMTP host %s", self.smtp_host)
+                if self._smtp_ip is None:
+                    return self.smtp_host
+        return self._smtp_ip
+    
+    async def _connect(self, conn: _PooledSMTP):
+        """Make sure a pooled session is connected, logged in and not due for recycling"""
+        idle = time.monotonic() - conn.last_used > SMTP_IDLE_TIMEOUT_SECONDS
+        if conn.smtp is not None and (
+            idle or not conn.smtp.is_connected or conn.messages_sent >= SMTP_POOL_MAX_MESSAGES
+        ):
+            conn.close()
+        
+        if conn.smtp is None:
+            smtp = aiosmtplib.SMTP(
+                hostname=await self._resolve_host(),
+                port=self.smtp_port,
+                start_tls=False,
+                tls_context=self._tls_context
+            )
+            await smtp.connect()
+            try:
+                await smtp.starttls(server_hostname=self.smtp_host, tls_context=self._tls_context)
+                await smtp.login(self.smtp_user, self.smtp_password)
+            except Exception:
+                # Not yet on the pooled session, so conn.close() would not reach it
+                smtp.close()
+                raise
+            conn.smtp = smtp
+    
+    async def _send_on(self, conn: _PooledSMTP, message):
+        """Send over one pooled session, reconnecting once if the server dropped it"""
+        try:
+            await self._connect(conn)
+            await conn.smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            conn.close()
+            await self._connect(conn)
+            await conn.smtp.send_message(message)
+        except Exception:
+            conn.close()
+            raise
+        conn.messages_sent += 1
+        conn.last_used = time.monotonic()
+    
+    async def _reap_idle(self):
+        """Periodically close sessions that are idle and not checked out"""
+        while True:
+            await asyncio.sleep(SMTP_IDLE_TIMEOUT_SECONDS)
+            now = time.monotonic()
+            for conn in self._connections:
+                if not conn.in_use and conn.smtp is not None and now - conn.last_used > SMTP_IDLE_TIMEOUT_SECONDS:
+                    conn.close()
+    
+    async def _send_message(self, message):
+        """Send a message on the next free pooled session"""
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_idle())
+        
+        conn = await self._pool.get()
+        conn.in_use = True
+        try:
+            await self._send_on(conn, message)
+        finally:
+            conn.in_use = False
+            self._pool.put_nowait(conn)
+    
+    async def close(self):
+        """Stop the idle reaper and close every pooled session"""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for conn in self._connections:
+            conn.close()
     
     async def send_email(self, to_email: str, subject: str, html_content: str):
         """Send email using SMTP"""
-        message = MIMEMultipart("alternative")
+        message = EmailMessage()
         message["Subject"] = subject
-        message["From"] = f"{self.from_name} <{self.from_email}>"
+        message["From"] = self._from_header
         message["To"] = to_email
         
-        html_part = MIMEText(html_content, "html", "utf-8")  # Added utf-8 encoding
-        message.attach(html_part)
+        message.set_content("Please view this email in HTML.", subtype="plain")
+        message.add_alternative(html_content, subtype="html", charset="utf-8")
         
         try:
-            await aiosmtplib.send(
-                message,
-                hostname=self.smtp_host,
-                port=self.smtp_port,
-                username=self.smtp_user,
-                password=self.smtp_password,
-                start_tls=True
-            )
-            print(f"✅ Email sent successfully to {to_email}")
+            await self._send_message(message)
+            logger.info("Email sent to %s", to_email)
             return True
-        except Exception as e:
-            print(f"❌ Failed to send email: {e}")
+        except Exception:
+            logger.exception("Failed to send email to %s", to_email)
             return False
     
+    async def send_many(self, jobs: List[Tuple[str, str, str]]) -> List[bool]:
+        """Send several emails concurrently over the session pool
+
+        Each job is (to_email, subject, html_content); returns a success flag per job.
+        """
+        return list(await asyncio.gather(*(self.send_email(*job) for job in jobs)))
+    
     async def send_otp_email(self, to_email: str, otp: str, user_name: str):
         """Send OTP verification email"""
-        with open("app/templates/otp_template.html", "r", encoding="utf-8") as f:  # Added encoding
-            template_content = f.read()
-        
-        template = Template(template_content)
-        html_content = template.render(otp=otp, user_name=user_name)
+        html_content = OTP_TEMPLATE.format(otp=html.escape(otp), user_name=html.escape(user_name))
         
         subject = "Your OTP Code - Skynet"
         return await self.send_email(to_email, subject, html_content)
     
     async def send_welcome_email(self, to_email: str, user_name: str):
         """Send welcome email after successful registration"""
-        with open("app/templates/welcome_template.html", "r", encoding="utf-8") as f:  # Added encoding
-            template_content = f.read()
-        
-        template = Template(template_content)
-        html_content = template.render(user_name=user_name)
+        html_content = WELCOME_TEMPLATE.format(user_name=html.escape(user_name))
         
         subject = "Welcome to Skynet! 🚀"
         return await self.send_email(to_email, subject, html_content)
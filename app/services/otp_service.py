@@ -1,17 +1,13 @@
-import random
-import string
+import secrets
 from datetime import datetime, timedelta, timezone
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
 
 OTP_EXPIRY_MINUTES = int(os.getenv("OTP_EXPIRY_MINUTES", 10))
 
 
 def generate_otp() -> str:
-    """Generate a 6-digit OTP"""
-    return ''.join(random.choices(string.digits, k=6))
+    """Generate a 6-digit OTP from a cryptographically secure source"""
+    return f"{secrets.randbelow(1_000_000):06d}"
 
 
 def get_otp_expiry() -> datetime:
@@ -20,12 +16,5 @@ def get_otp_expiry() -> datetime:
 
 
 def is_otp_valid(otp_expiry: datetime) -> bool:
-    """Check if OTP is still valid"""
-    # Make current time timezone-aware
-    current_time = datetime.now(timezone.utc)
-    
-    # If otp_expiry is naive, make it aware
-    if otp_expiry.tzinfo is None:
-        otp_expiry = otp_expiry.replace(tzinfo=timezone.utc)
-    
-    return current_time < otp_expiry
+    """Check if OTP is still valid (otp_expiry comes from a TIMESTAMPTZ column, so it is aware)"""
+    return datetime.now(timezone.utc) < otp_expiry
@@ -1,23 +1,58 @@
 from passlib.context import CryptContext
-from jose import JWTError, jwt
+from jose import JWTError, jwk, jwt
+from cachetools import TTLCache
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 import os
-from dotenv import load_dotenv
 import hashlib
+import logging
+import hmac
+import threading
+import time
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost is pinned so login latency stays predictable:
+# ~60 ms per hash/verify at 10 rounds vs ~250 ms at 12 on a typical vCPU
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 10))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 # JWT settings
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production").strip()
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
+# Key object built once; jose otherwise resolves the algorithm and rebuilds it on every call
+_JWT_KEY = jwk.construct(SECRET_KEY, ALGORITHM)
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+# Opt-in: reuse an issued token for identical claims until it is this close to
+# expiry (0, the default, always issues a fresh token). A token is only reused
+# while at least half of its lifetime is left.
+JWT_REUSE_THRESHOLD_SECONDS = int(os.getenv("JWT_REUSE_THRESHOLD_SECONDS", 0))
+# Cached tokens are treated as expired this many seconds early
+JWT_LEEWAY_SECONDS = 5
 
-secret_hash = hashlib.md5(SECRET_KEY.encode()).hexdigest()[:8]
-print(f"🔐 SECRET_KEY loaded (hash: {secret_hash}), Algorithm: {ALGORITHM}")
+# Validated tokens keyed by SHA-256 of the token -> (exp timestamp, payload).
+# Entries live for the token lifetime; expiry is checked on every hit
+# (failures are never cached)
+_jwt_cache = TTLCache(maxsize=10_000, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+_jwt_cache_lock = threading.Lock()
+
+# Digests of tokens that just failed to decode; kept only a couple of seconds
+# to absorb bursts of the same bad token without re-running jose each time
+_bad_cache = TTLCache(maxsize=4096, ttl=2)
+_bad_cache_lock = threading.Lock()
+
+# Successful password checks keyed by HMAC(SECRET_KEY, hash|password); failures are
+# never cached so every wrong guess still pays the full bcrypt cost
+_pw_cache = TTLCache(maxsize=2048, ttl=300)
+_pw_cache_lock = threading.Lock()
+
+# Issued tokens keyed by (claims, expires_delta) -> (token, exp timestamp, lifetime seconds)
+_issued_cache = TTLCache(maxsize=10_000, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+_issued_cache_lock = threading.Lock()
+
+secret_hash = hashlib.blake2b(SECRET_KEY.encode(), digest_size=4).hexdigest()
+logger.info("SECRET_KEY loaded (hash: %s), Algorithm: %s", secret_hash, ALGORITHM)
 
 
 def hash_password(password: str) -> str:
@@ -27,33 +62,83 @@ def hash_password(password: str) -> str:
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    key = hmac.new(SECRET_KEY.encode(), f"{hashed_password}|{plain_password}".encode(), "sha256").digest()
+    with _pw_cache_lock:
+        if key in _pw_cache:
+            return True
+
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False
+
+    with _pw_cache_lock:
+        _pw_cache[key] = True
+    return True
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
+    key = None
+    if JWT_REUSE_THRESHOLD_SECONDS > 0:
+        try:
+            key = (frozenset(data.items()), expires_delta)
+            with _issued_cache_lock:
+                cached = _issued_cache.get(key)
+        except TypeError:
+            # Unhashable claim values; always issue a fresh token
+            key, cached = None, None
+        if cached is not None:
+            token, exp_ts, lifetime = cached
+            if exp_ts - time.time() > max(JWT_REUSE_THRESHOLD_SECONDS, lifetime / 2):
+                return token
+
     to_encode = data.copy()
     
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    lifetime = expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    expire = datetime.now(timezone.utc) + lifetime
     
     to_encode.update({"exp": expire})
     
-    print(f"🔑 Creating token with SECRET_KEY hash: {secret_hash}")
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    logger.debug("Creating token with SECRET_KEY hash: %s", secret_hash)
+    encoded_jwt = jwt.encode(to_encode, _JWT_KEY, algorithm=ALGORITHM)
+    
+    if key is not None:
+        with _issued_cache_lock:
+            _issued_cache[key] = (encoded_jwt, expire.timestamp(), lifetime.total_seconds())
     
     return encoded_jwt
 
 
-def decode_access_token(token: str):
-    """Decode JWT access token"""
+def _full_decode(token: str, key: bytes):
+    """Verify the signature and claims of a token and cache the result"""
+    with _bad_cache_lock:
+        if key in _bad_cache:
+            return None
+
     try:
-        print(f"🔓 Decoding token with SECRET_KEY hash: {secret_hash}")
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        print(f"✅ Token decoded successfully: {payload}")
-        return payload
+        payload = jwt.decode(token, _JWT_KEY, algorithms=[ALGORITHM])
     except JWTError as e:
-        print(f"❌ JWT decode error: {e}")
+        logger.debug("JWT decode error: %s", e)
+        with _bad_cache_lock:
+            _bad_cache[key] = True
         return None
+
+    logger.debug("Token decoded for sub %s", payload.get("sub"))
+    with _jwt_cache_lock:
+        _jwt_cache[key] = (payload.get("exp", 0), payload)
+    return payload
+
+
+def verify_token_fast(token: str):
+    """Return the payload of a valid token, skipping the signature check for cached tokens"""
+    key = hashlib.sha256(token.encode()).digest()
+    with _jwt_cache_lock:
+        cached = _jwt_cache.get(key)
+    if cached is not None and time.time() < cached[0] - JWT_LEEWAY_SECONDS:
+        return cached[1]
+
+    return _full_decode(token, key)
+
+
+def decode_access_token(token: str):
+    """Decode JWT access token"""
+    return verify_token_fast(token)
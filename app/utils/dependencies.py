@@ -1,28 +1,60 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+from cachetools import TTLCache
 from app.database.connection import get_db
 from app.models.model import User
-from app.utils.auth_utils import decode_access_token
+from app.utils.auth_utils import verify_token_fast
+import hashlib
+import threading
+import time
 
 security = HTTPBearer()
 
+# Token digest -> (user_id, token exp) for tokens whose user was recently
+# confirmed active and verified. Only ids are cached, never ORM objects,
+# since sessions are per request.
+USER_CACHE_TTL_SECONDS = 60
+_user_cache = TTLCache(maxsize=10_000, ttl=USER_CACHE_TTL_SECONDS)
+_user_cache_lock = threading.Lock()
 
-def get_current_user(
+
+def _check_user_status(user: User):
+    """Reject users that are missing, deactivated or unverified"""
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+
+    if not user.is_active or not user.is_verified:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account is not active or not verified"
+        )
+
+
+def get_current_user_id(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
-):
-    """Get current authenticated user"""
+) -> int:
+    """Get the id of the current authenticated user (cached per token)"""
     token = credentials.credentials
-    
-    payload = decode_access_token(token)
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    with _user_cache_lock:
+        cached = _user_cache.get(key)
+    if cached is not None and time.time() < cached[1]:
+        return cached[0]
+
+    payload = verify_token_fast(token)
     if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+
     # Extract user_id from payload - handle both string and int
     user_id = payload.get("sub")
     if user_id is None:
@@ -31,7 +63,7 @@ def get_current_user(
             detail="Invalid token payload",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+
     # Convert to int if it's a string
     try:
         user_id = int(user_id)
@@ -41,18 +73,21 @@ def get_current_user(
             detail="Invalid user ID in token",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
-        )
-    
-    if not user.is_active or not user.is_verified:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="User account is not active or not verified"
-        )
-    
+
+    _check_user_status(db.get(User, user_id))
+
+    with _user_cache_lock:
+        _user_cache[key] = (user_id, payload.get("exp", 0))
+
+    return user_id
+
+
+def get_current_user(
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """Get current authenticated user"""
+    # On a cache miss the row is already in this session's identity map
+    user = db.get(User, user_id)
+    _check_user_status(user)
     return user
@@ -13,30 +13,105 @@
 
 # ------------------------------------------------------------------------
 
+# Load .env once, before any app module reads its settings at import time
+from dotenv import load_dotenv
+load_dotenv()
+
+import asyncio
+import logging
+import logging.handlers
+import os
+import queue
+
+# Log records are queued by the request threads and written by a listener thread.
+# Configured before the app imports so records logged at import time are kept
+# Added directly rather than via basicConfig, which would give the QueueHandler a
+# default formatter and have every record formatted twice. This module can run
+# twice in one process (as __mp_main__ and as main under the uvicorn reloader),
+# so an existing QueueHandler and its queue are reused rather than duplicated
+root_logger = logging.getLogger()
+queue_handler = next(
+    (h for h in root_logger.handlers if isinstance(h, logging.handlers.QueueHandler)), None
+)
+if queue_handler is None:
+    queue_handler = logging.handlers.QueueHandler(queue.Queue(-1))
+    root_logger.addHandler(queue_handler)
+root_logger.setLevel(os.getenv("LOG_LEVEL", "INFO"))
+# azure-core logs full request/response headers for every call at INFO
+logging.getLogger("azure").setLevel(os.getenv("AZURE_LOG_LEVEL", "WARNING"))
+
+log_queue = queue_handler.queue
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+log_listener = logging.handlers.QueueListener(log_queue, log_handler)
+
 from fastapi import FastAPI
 from app.database.connection import engine, Base, test_connection
 from app.routers import auth, users, documents
 from app.database.azure_blob import azure_storage
+from app.services.email_service import email_service
 import uvicorn
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="Skynet LLM API", version="2.0.0")
 
+# /health serves this snapshot; a background task refreshes it
+HEALTH_REFRESH_SECONDS = 5
+health_status = {
+    "database": "AWS RDS disconnected",
+    "azure_storage": "Azure Blob Storage not checked yet"
+}
+health_task = None
+
+
+async def refresh_health():
+    db_ok = await asyncio.to_thread(test_connection)
+    health_status["database"] = "AWS RDS connected" if db_ok else "AWS RDS disconnected"
+    
+    try:
+        await azure_storage.container_client.get_container_properties()
+        health_status["azure_storage"] = "Azure Blob Storage connected"
+    except Exception:
+        health_status["azure_storage"] = "Azure Blob Storage disconnected"
+
+
+async def health_refresher():
+    while True:
+        await asyncio.sleep(HEALTH_REFRESH_SECONDS)
+        await refresh_health()
+
 # database connection on startup
 @app.on_event("startup")
-def startup_event():
-    print("🚀 Starting Skynet application...")
-    if test_connection():
-        print("📊 Creating database tables...")
-        Base.metadata.create_all(bind=engine)
-        print("✅ Tables created successfully!")
-    else:
-        print("⚠️ Warning: Could not connect to database")
+async def startup_event():
+    global health_task
+    log_listener.start()
+    logger.info("Starting Skynet application...")
+    db_ok = await asyncio.to_thread(test_connection)
+    health_status["database"] = "AWS RDS connected" if db_ok else "AWS RDS disconnected"
+    if not db_ok:
+        logger.warning("Could not connect to database")
+    elif os.getenv("AUTO_CREATE_TABLES") == "1":
+        # Schema is normally created at deploy time; this is for local development
+        logger.info("Creating database tables...")
+        await asyncio.to_thread(Base.metadata.create_all, bind=engine)
+        logger.info("Tables created successfully")
     
     try:
-        container_name = azure_storage.container_name
-        print(f"✅ Azure Blob Storage connected - Container: {container_name}")
+        await azure_storage.open()
+        logger.info("Azure Blob Storage configured - Container: %s", azure_storage.container_name)
     except Exception as e:
-        print(f"⚠️ Warning: Could not connect to Azure Blob Storage: {e}")
+        logger.warning("Could not connect to Azure Blob Storage: %s", e)
+    
+    health_task = asyncio.create_task(health_refresher())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if health_task is not None:
+        health_task.cancel()
+    await azure_storage.close()
+    await email_service.close()
+    log_listener.stop()
 
 # Include routers
 app.include_router(auth.router)
@@ -44,7 +119,7 @@ app.include_router(users.router)
 app.include_router(documents.router)
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {
         "message": "Welcome to Skynet LLM API",
         "status": "running",
@@ -59,19 +134,10 @@ def read_root():
 
 
 @app.get("/health")
-def health_check():
-    db_status = "AWS RDS connected" if test_connection() else "AWS RDS disconnected"
-    
-    try:
-        azure_storage.container_client.get_container_properties()
-        azure_status = "Azure Blob Storage connected"
-    except:
-        azure_status = "Azure Blob Storage disconnected"
-
+async def health_check():
     return {
         "status": "healthy",
-        "database": db_status,
-        "azure_storage": azure_status
+        **health_status
     }
 
 if __name__ == "__main__":